@@ -36,6 +36,35 @@ class Dataset:
         self.df.index.name = Dataset._INDEX
         self.name = name
 
+    @property
+    def df(self):
+        # The added rows are only concatenated to the DataFrame when it is
+        # accessed: appending them one group at a time would copy the whole
+        # DataFrame at every addition
+        if self._pending:
+            if len(self._df) > 0:
+                self._df = pd.concat([self._df] + self._pending,
+                                     ignore_index=True)
+            else:
+                # The initial DataFrame has no rows and only object columns:
+                # it is left out, so the dtypes are inferred from the added
+                # rows alone. The columns that were not added stay objects
+                df = pd.concat(self._pending, ignore_index=True)
+                missing = {cname: object for cname in self._df.columns
+                           if cname not in df.columns}
+                columns = list(self._df.columns) + [
+                    cname for cname in df.columns
+                    if cname not in self._df.columns
+                ]
+                self._df = df.reindex(columns=columns).astype(missing)
+            self._pending = []
+        return self._df
+
+    @df.setter
+    def df(self, new_df):
+        self._df = new_df
+        self._pending = []
+
     def __getattr__(self, item):
         if item in self.__dict__:
             return getattr(self, item)
@@ -53,9 +82,15 @@ class Dataset:
     def add_entry(self, *args, **kwargs):
         entry = {kw: [arg] for kw, arg in zip(self.columns, args)}
         entry.update({kw: [arg] for kw, arg in kwargs.items()})
-        self.df = self.df.append(pd.DataFrame(entry), ignore_index=True)
+        self._pending.append(pd.DataFrame(entry))
 
     def add_group(self, group, group_number=None):
+        # Arrays with one row per entry (e.g., stacked states) are split into
+        # their rows, so each cell of the DataFrame holds one entry
+        group = {cname: list(value)
+                 if isinstance(value, np.ndarray) and value.ndim > 1
+                 else value
+                 for cname, value in group.items()}
         if group.get(self.group_name) is None:
             if group_number is None:
                 group_number = self.df[self.group_name].max() + 1
@@ -66,7 +101,17 @@ class Dataset:
             group.update({
                 self.group_name: [group_number]*group_length
             })
-        self.df = self.df.append(pd.DataFrame(group), ignore_index=True)
+        self._pending.append(pd.DataFrame(group))
+
+    def snapshot(self):
+        """ Returns a copy of the Dataset that is not affected by later additions to this one, for instance to save it
+        in the background
+        :return: Dataset
+        """
+        ds = Dataset(*self.columns_wo_group, group_name=self.group_name,
+                     name=self.name)
+        ds.df = self.df.copy()
+        return ds
 
     def save(self, filepath):
         filepath = Path(filepath)
@@ -1,10 +1,39 @@
-from numpy import squeeze, around, linspace, meshgrid, dstack
-from scipy.interpolate import RegularGridInterpolator
+from numpy import squeeze, around, linspace, meshgrid, empty, \
+    ndenumerate, float64
+from numba import njit, prange
 import matplotlib as mpl
 
 from . import Subplotter
 
 
+@njit(parallel=True, cache=True, fastmath=True)
+def _bilinear_2d(Q, x0, dx, y0, dy, xs, ys, out):
+    """
+    Bilinear interpolation of Q, sampled on the regular grid defined by
+    (x0, dx) and (y0, dy), at the points (xs[i], ys[i]). The first axis of Q
+    corresponds to y, and the second one to x. Points outside of the grid are
+    clamped to its boundary.
+    :param Q: np.ndarray of shape (ny, nx)
+    :param x0, dx: first value and step of the x axis
+    :param y0, dy: first value and step of the y axis
+    :param xs: np.ndarray of shape (n_out,): the x coordinates of the output
+    :param ys: np.ndarray of shape (n_out,): the y coordinates of the output
+    :param out: np.ndarray of shape (n_out,): where the result is written
+    """
+    ny, nx = Q.shape
+    for i in prange(xs.shape[0]):
+        fx = min(max((xs[i] - x0) / dx, 0.), nx - 1.)
+        ix = min(int(fx), nx - 2)
+        tx = fx - ix
+        fy = min(max((ys[i] - y0) / dy, 0.), ny - 1.)
+        iy = min(int(fy), ny - 2)
+        ty = fy - iy
+        out[i] = (1 - tx) * (1 - ty) * Q[iy, ix] + \
+            tx * (1 - ty) * Q[iy, ix + 1] + \
+            (1 - tx) * ty * Q[iy + 1, ix] + \
+            tx * ty * Q[iy + 1, ix + 1]
+
+
 class QValueSubplotter(Subplotter):
     def __init__(self, agent, colors, write_values=False, vmin=None, vmax=None,
                  scale='log'):
@@ -12,9 +41,9 @@ class QValueSubplotter(Subplotter):
         self.agent = agent
         self.states = squeeze(self.model.env.state_space[:])
         self.actions = squeeze(self.model.env.action_space[:])
-        stateaction_grid = self.model.env.stateaction_space[:, :]
-        self.states_grid = stateaction_grid[:, :, 0]
-        self.actions_grid = stateaction_grid[:, :, 1]
+        self.states_grid, self.actions_grid = meshgrid(
+            self.states, self.actions, indexing='ij'
+        )
         self.write_values = write_values
         self.vmin = vmin
         self.vmax = vmax
@@ -29,17 +58,19 @@ class QValueSubplotter(Subplotter):
             qmin = self.vmin
             qmax = self.vmax
         else:
-            nonzero_Q = Q_values[Q_values.nonzero()]
-            if len(nonzero_Q) == 0:
+            mask = Q_values != 0
+            if not mask.any():
                 return -1, 1
             else:
-                qmin = nonzero_Q.min()
-                qmax = nonzero_Q.max()
+                qmin = Q_values[mask].min()
+                qmax = Q_values[mask].max()
                 return qmin, qmax
         return qmin, qmax
 
     def draw_on_axs(self, ax_Q, Q_values):
         vmin, vmax = self.__get_min_max(Q_values)
+        # Each image has its own norm: a shared one would rescale the figures
+        # that are still open
         self.colors.q_values_norm = mpl.colors.SymLogNorm(
             linthresh=0.1, linscale=1, base=10, vmin=vmin, vmax=vmax
         ) if self.scale == 'log' else None
@@ -54,10 +85,10 @@ class QValueSubplotter(Subplotter):
             alpha=0.7
         )
         if self.write_values:
-            for i in range(Q_values.shape[0]):
-                for j in range(Q_values.shape[1]):
-                    ax_Q.text(j, i, around(Q_values[i, j], 1),
-                              ha='center', va='center')
+            rounded = around(Q_values, 1)
+            text = ax_Q.text
+            for (i, j), v in ndenumerate(rounded):
+                text(j, i, v, ha='center', va='center')
         # action_ticks = around(linspace(self.actions[0], self.actions[-1], 11), decimals=2)
         # state_ticks = around(linspace(self.states[0], self.actions[-1], 11), decimals=2)
         # ax_Q.set_xticks(action_ticks)
@@ -83,9 +114,9 @@ class DiscreteQValueSubplotter(Subplotter):
         self.agent = agent
         self.states = squeeze(self.model.env.state_space[:])
         self.actions = squeeze(self.model.env.action_space[:])
-        stateaction_grid = self.model.env.stateaction_space[:, :]
-        self.states_grid = stateaction_grid[:, :, 0]
-        self.actions_grid = stateaction_grid[:, :, 1]
+        self.states_grid, self.actions_grid = meshgrid(
+            self.states, self.actions, indexing='ij'
+        )
         self.write_values = write_values
         self.vmin = vmin
         self.vmax = vmax
@@ -95,9 +126,14 @@ class DiscreteQValueSubplotter(Subplotter):
         self.int_actions_grid, self.int_states_grid = meshgrid(
             self.int_actions, self.int_states
         )
-        self.int_sa = dstack(
-            (self.int_actions_grid, self.int_states_grid)
-        ).reshape((-1, 2))
+        self._x0 = self.actions[0]
+        self._dx = self.actions[1] - self.actions[0]
+        self._y0 = self.states[0]
+        self._dy = self.states[1] - self.states[0]
+        # The interpolation points are stored as two contiguous arrays
+        self.int_xs = self.int_actions_grid.ravel().astype(float64)
+        self.int_ys = self.int_states_grid.ravel().astype(float64)
+        self._int_Q = empty(self.int_xs.shape[0])
 
     @property
     def model(self):
@@ -108,22 +144,19 @@ class DiscreteQValueSubplotter(Subplotter):
             qmin = self.vmin
             qmax = self.vmax
         else:
-            nonzero_Q = Q_values[Q_values.nonzero()]
-            if len(nonzero_Q) == 0:
+            mask = Q_values != 0
+            if not mask.any():
                 return -1, 1
             else:
-                qmin = nonzero_Q.min()
-                qmax = nonzero_Q.max()
+                qmin = Q_values[mask].min()
+                qmax = Q_values[mask].max()
                 return qmin, qmax
         return qmin, qmax
 
     def draw_on_axs(self, ax_Q, Q_values):
-        f = RegularGridInterpolator(
-            (self.actions, self.states),
-            Q_values.T,
-            method='linear'
-        )
-        int_Q_values = f(self.int_sa).reshape(self.int_states_grid.shape)
+        _bilinear_2d(Q_values, self._x0, self._dx, self._y0, self._dy,
+                     self.int_xs, self.int_ys, self._int_Q)
+        int_Q_values = self._int_Q.reshape(self.int_states_grid.shape)
 
         vmin, vmax = self.__get_min_max(Q_values)
         image = ax_Q.pcolormesh(
@@ -136,10 +169,10 @@ class DiscreteQValueSubplotter(Subplotter):
             alpha=0.5
         )
         if self.write_values:
-            for i in range(Q_values.shape[0]):
-                for j in range(Q_values.shape[1]):
-                    ax_Q.text(j, i, around(Q_values[i, j], 1),
-                              ha='center', va='center')
+            rounded = around(Q_values, 1)
+            text = ax_Q.text
+            for (i, j), v in ndenumerate(rounded):
+                text(j, i, v, ha='center', va='center')
         action_ticks = around(self.actions, decimals=2)
         state_ticks = around(self.states, decimals=2)
         ax_Q.set_xticks(action_ticks)
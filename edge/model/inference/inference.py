@@ -1,4 +1,6 @@
 import logging
+from contextlib import nullcontext
+from inspect import signature
 import gpytorch
 import torch
 from sklearn.neighbors import KDTree
@@ -12,6 +14,24 @@ def data_path_from_gp_path(gp_path):
     return gp_path[:-4] + '_data.pt'
 
 
+def _fused_optimizer_kwargs(optimizer):
+    # On the GPU, the update of all the parameters is done by a single kernel
+    # if the optimizer supports it (PyTorch >= 2.0 for `fused`, >= 1.12 for
+    # `foreach`). The hyperparameters are only a few tiny tensors, so the
+    # launch overhead of one kernel per parameter would dominate
+    if device != cuda:
+        return {}
+    try:
+        parameters = signature(optimizer).parameters
+    except (TypeError, ValueError):
+        return {}
+    if 'fused' in parameters:
+        return {'fused': True}
+    elif 'foreach' in parameters:
+        return {'foreach': True}
+    return {}
+
+
 class GP(gpytorch.models.ExactGP):
     """
     Base class for Gaussian Processes. Provides a wrapping around GPyTorch to encapsulate it from the rest of the code.
@@ -156,17 +176,30 @@ class GP(gpytorch.models.ExactGP):
         covar = self.covar_module(x)
         return gpytorch.distributions.MultivariateNormal(mean, covar)
 
-    def optimize_hyperparameters(self, epochs, **optimizer_kwargs):
+    def optimize_hyperparameters(self, epochs, backend='torch',
+                                 **optimizer_kwargs):
         """
         Optimizes the hyperparameters of the GP on its current dataset. This function can be run several times with
         different parameterizations for the optimizer, enabling refining of parameters such as the learning rate.
         If you want a "smart" adaptation of the parameters, you should redefine this method.
         :param epochs: the number of epochs
+        :param backend: 'torch' or 'jax'. If 'jax', the optimization is done by
+            edge.model.inference.jax_fitting.optimize_hyperparameters, which requires jax and optax and only supports
+            the default Adam optimizer and a MaternGP without value structure
         :param optimizer_kwargs: the parameters passed to the optimizer. See GPyTorch documentation for more information
         """
+        if backend == 'jax':
+            # Imported here, since jax is an optional dependency
+            from .jax_fitting import optimize_hyperparameters
+            return optimize_hyperparameters(self, epochs, **optimizer_kwargs)
+        elif backend != 'torch':
+            raise ValueError(f'Unknown backend {backend}')
+
         self.train()
         self.likelihood.train()
 
+        optimizer_kwargs = {**_fused_optimizer_kwargs(self.optimizer),
+                            **optimizer_kwargs}
         optimizer = self.optimizer(
             [{'params': self.parameters()}],
             **optimizer_kwargs
@@ -176,20 +209,35 @@ class GP(gpytorch.models.ExactGP):
         if self.has_value_structure:
             # We discard the last observation if the GP has a value structure
             data_to_explain = self.train_y[:-1]
+
+        # The data is fixed during the optimization, and is already a tensor:
+        # we directly call ExactGP.__call__ and skip the casting done by
+        # @tensorwrap on every epoch
+        train_x = self.train_x
+        call = super(GP, self).__call__
         for n in range(epochs):
             optimizer.zero_grad()
-            output = self(self.train_x)
+            output = call(train_x)
             loss = -mll(output, data_to_explain)
             loss.backward()
             optimizer.step()
 
     @tensorwrap('x')
     def predict(self, x, gp_only=False):
-        self.eval()
-        self.likelihood.eval()
+        # GPyTorch caches the posterior (the solve against the train data)
+        # while the model stays in eval mode, and only drops it when the
+        # train data changes or the model is set back to train mode. Calling
+        # eval() walks all the submodules, so we only do it when needed
+        if self.training:
+            self.eval()
+        if self.likelihood.training:
+            self.likelihood.eval()
 
         # This `with` clause is taken from the GPyTorch tutorials. I don't know whether they truly improve performance
-        with torch.no_grad(), gpytorch.settings.fast_pred_var():
+        # The fast_pred_var context is not entered again if the caller already opened it around a whole loop
+        fast_pred_var = nullcontext() if gpytorch.settings.fast_pred_var.on()\
+            else gpytorch.settings.fast_pred_var()
+        with torch.no_grad(), fast_pred_var:
             if gp_only:
                 return self(x)
             else:
@@ -0,0 +1,187 @@
+"""
+Optional JAX backend for the optimization of the hyperparameters of a MaternGP.
+The exact marginal log likelihood and the log priors of the hyperparameters are written in JAX, and the whole Adam
+loop is compiled with `jax.jit`. This removes the Python and dispatch overhead of the PyTorch loop, which dominates
+for small datasets. The optimized values are then copied back into the GPyTorch model, so the rest of the code is
+unaffected.
+Requires `jax` and `optax`, which are not dependencies of this package.
+"""
+import math
+import numpy as np
+import torch
+import gpytorch
+from gpytorch.constraints import Interval, GreaterThan, LessThan, Positive
+from gpytorch.priors import NormalPrior, MultivariateNormalPrior
+
+import jax
+import jax.numpy as jnp
+from jax.scipy.linalg import cho_solve
+import optax
+
+_OUTPUTSCALE = 'covar_module.raw_outputscale'
+_LENGTHSCALE = 'covar_module.base_kernel.raw_lengthscale'
+_NOISE = 'likelihood.noise_covar.raw_noise'
+_MEAN_PREFIX = 'mean_module.'
+
+
+def torch_to_jax(tensor):
+    return jnp.asarray(tensor.detach().cpu().numpy())
+
+
+def jax_to_torch(array, like):
+    return torch.as_tensor(np.asarray(array), dtype=like.dtype,
+                           device=like.device)
+
+
+def _check_supported(gp):
+    if gp.has_value_structure:
+        raise NotImplementedError('The JAX backend does not support GPs with '
+                                  'a value structure')
+    kernel = gp.covar_module
+    if not (isinstance(kernel, gpytorch.kernels.ScaleKernel) and
+            isinstance(kernel.base_kernel, gpytorch.kernels.MaternKernel)):
+        raise NotImplementedError('The JAX backend only supports a scaled '
+                                  'Matern kernel')
+    if not isinstance(gp.mean_module, (gpytorch.means.ZeroMean,
+                                       gpytorch.means.ConstantMean)):
+        raise NotImplementedError('The JAX backend only supports a zero or '
+                                  'constant mean')
+    if gp.optimizer is not torch.optim.Adam:
+        raise NotImplementedError('The JAX backend only supports the Adam '
+                                  'optimizer')
+    if gp.mll is not gpytorch.mlls.ExactMarginalLogLikelihood:
+        raise NotImplementedError('The JAX backend only supports the exact '
+                                  'marginal log likelihood')
+
+
+def _transform(constraint):
+    """ Returns the JAX equivalent of constraint.transform """
+    if constraint is None or not constraint.enforced:
+        return lambda x: x
+    if isinstance(constraint, Positive):
+        return jax.nn.softplus
+    elif isinstance(constraint, GreaterThan):
+        lower = float(constraint.lower_bound)
+        return lambda x: jax.nn.softplus(x) + lower
+    elif isinstance(constraint, LessThan):
+        upper = float(constraint.upper_bound)
+        return lambda x: -jax.nn.softplus(-x) + upper
+    elif isinstance(constraint, Interval):
+        lower = float(constraint.lower_bound)
+        upper = float(constraint.upper_bound)
+        return lambda x: jax.nn.sigmoid(x) * (upper - lower) + lower
+    raise NotImplementedError(f'Unsupported constraint {constraint}')
+
+
+def _log_prior(prior):
+    """ Returns the JAX equivalent of prior.log_prob """
+    if isinstance(prior, NormalPrior):
+        loc = torch_to_jax(prior.loc)
+        scale = torch_to_jax(prior.scale)
+        return lambda x: jax.scipy.stats.norm.logpdf(x, loc, scale).sum()
+    elif isinstance(prior, MultivariateNormalPrior):
+        loc = torch_to_jax(prior.loc)
+        covariance = torch_to_jax(prior.covariance_matrix)
+        return lambda x: jax.scipy.stats.multivariate_normal.logpdf(
+            x, loc, covariance
+        ).sum()
+    raise NotImplementedError(f'Unsupported prior {prior}')
+
+
+def _matern(x, lengthscale, nu):
+    x = x / lengthscale
+    sq_distance = ((x[:, None, :] - x[None, :, :]) ** 2).sum(-1)
+    # Same clamping as Kernel.covar_dist, so the gradient is finite on the
+    # diagonal
+    distance = jnp.sqrt(jnp.maximum(sq_distance, 1e-30))
+    exp_component = jnp.exp(-math.sqrt(nu * 2) * distance)
+    if nu == 0.5:
+        constant_component = 1
+    elif nu == 1.5:
+        constant_component = math.sqrt(3) * distance + 1
+    else:
+        constant_component = math.sqrt(5) * distance + 1 + \
+            5. / 3. * sq_distance
+    return constant_component * exp_component
+
+
+def _make_loss(gp, train_x, train_y):
+    """ Builds the negative exact marginal log likelihood of the GP, divided by the number of data points as in
+    gpytorch.mlls.ExactMarginalLogLikelihood, as a function of the raw parameters
+    """
+    nu = gp.covar_module.base_kernel.nu
+    transforms = {name: _transform(constraint) for name, _, constraint
+                  in gp.named_parameters_and_constraints()}
+    # The prior of `module.x` is named `module.x_prior` and is defined on the
+    # transformed value of the parameter `module.raw_x`
+    priors = []
+    for name, _, prior, _, _ in gp.named_priors():
+        module_name, prior_name = name.rsplit('.', 1)
+        param_name = f'{module_name}.raw_{prior_name[:-len("_prior")]}'
+        priors.append((param_name, _log_prior(prior)))
+    # The parameter of ConstantMean is called `constant` or `raw_constant`
+    # depending on the version of GPyTorch
+    mean_names = [name for name in transforms.keys()
+                  if name.startswith(_MEAN_PREFIX)]
+    n = train_y.shape[0]
+
+    def transformed(params, name):
+        return transforms[name](params[name])
+
+    def loss(params):
+        outputscale = transformed(params, _OUTPUTSCALE)
+        lengthscale = transformed(params, _LENGTHSCALE)
+        noise = transformed(params, _NOISE)
+        mean = transformed(params, mean_names[0]) if mean_names else 0.
+        covar = outputscale * _matern(train_x, lengthscale, nu) + \
+            noise * jnp.eye(n)
+        chol = jnp.linalg.cholesky(covar)
+        residual = train_y - mean
+        alpha = cho_solve((chol, True), residual)
+        log_likelihood = -0.5 * residual @ alpha - \
+            jnp.log(jnp.diag(chol)).sum() - 0.5 * n * math.log(2 * math.pi)
+        for param_name, log_prior in priors:
+            log_likelihood = log_likelihood + log_prior(
+                transformed(params, param_name)
+            )
+        return -log_likelihood / n
+
+    return loss
+
+
+def optimize_hyperparameters(gp, epochs, lr=0.001):
+    """
+    Optimizes the hyperparameters of a MaternGP with Adam on its current dataset, in JAX. This is equivalent to
+    GP.optimize_hyperparameters with the default optimizer.
+    :param gp: the MaternGP. Must not have a value structure
+    :param epochs: the number of epochs
+    :param lr: the learning rate of Adam
+    """
+    _check_supported(gp)
+    torch_params = dict(gp.named_parameters())
+    params = {name: torch_to_jax(param) for name, param in torch_params.items()}
+    train_x = torch_to_jax(gp.train_x)
+    train_y = torch_to_jax(gp.train_y).reshape(-1)
+
+    loss = _make_loss(gp, train_x, train_y)
+    optimizer = optax.adam(lr)
+
+    @jax.jit
+    def run(params):
+        def step(_, state):
+            params, opt_state = state
+            grads = jax.grad(loss)(params)
+            updates, opt_state = optimizer.update(grads, opt_state, params)
+            return optax.apply_updates(params, updates), opt_state
+        return jax.lax.fori_loop(0, epochs, step,
+                                 (params, optimizer.init(params)))[0]
+
+    params = run(params)
+
+    # The prediction caches of GPyTorch are cleared by setting the train mode,
+    # as in GP.optimize_hyperparameters
+    gp.train()
+    gp.likelihood.train()
+    with torch.no_grad():
+        for name, param in torch_params.items():
+            param.copy_(jax_to_torch(params[name], param))
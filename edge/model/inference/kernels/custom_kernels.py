@@ -1,5 +1,6 @@
+import math
 import torch
-from gpytorch.kernels import Kernel, ProductKernel
+from gpytorch.kernels import Kernel, ProductKernel, MaternKernel
 from edge.model.inference.tensorwrap import ensure_tensor
 from edge.utils import device
 
@@ -74,3 +75,67 @@ class ProductDecompositionKernel(ProductKernel):
         for name, val in kwargs.items():
             index, pname = get_index_and_name(name)
             self.base_kernels[index].initialize(**{pname: val})
+
+
+class TrainDistanceCachingMaternKernel(MaternKernel):
+    """
+    Matern kernel that caches the squared differences between the training inputs along each dimension.
+    When optimizing the hyperparameters, the kernel is evaluated at every epoch on the same training inputs, and only the
+    lengthscale changes. The distances are then computed from the cache instead of from the inputs.
+    The cache is only used in training mode, when the kernel is evaluated on a single tensor against itself. It is
+    dropped when the kernel is set to eval mode.
+    With one lengthscale per dimension, the cache stores the (n, n, d) squared differences, which is d times the memory
+    of the (n, n) distance matrix. With a single lengthscale, only the (n, n) squared distances are stored.
+    """
+    def __init__(self, *args, **kwargs):
+        super(TrainDistanceCachingMaternKernel, self).__init__(*args, **kwargs)
+        self._clear_distance_cache()
+
+    def _clear_distance_cache(self):
+        self._cached_x = None
+        self._cached_x_version = None
+        self._cached_sq_diffs = None
+
+    def train(self, mode=True):
+        if not mode:
+            self._clear_distance_cache()
+        return super(TrainDistanceCachingMaternKernel, self).train(mode)
+
+    def _squared_differences(self, x):
+        if self._cached_x is not x or self._cached_x_version != x._version:
+            sq_diffs = (x.unsqueeze(-2) - x.unsqueeze(-3)).pow(2)
+            if self.ard_num_dims is None:
+                # A single lengthscale: only the squared distance is needed
+                sq_diffs = sq_diffs.sum(-1, keepdim=True)
+            self._cached_sq_diffs = sq_diffs
+            self._cached_x = x
+            self._cached_x_version = x._version
+        return self._cached_sq_diffs
+
+    def forward(self, x1, x2, diag=False, **params):
+        use_cache = self.training and (x1 is x2) and (not diag) and \
+            (not x1.requires_grad) and \
+            (not params.get('last_dim_is_batch', False))
+        if not use_cache:
+            return super(TrainDistanceCachingMaternKernel, self).forward(
+                x1, x2, diag=diag, **params
+            )
+        # Weighted sum of the squared differences along each dimension
+        inv_sq_lengthscale = self.lengthscale.pow(-2).transpose(-1, -2)
+        sq_distance = torch.matmul(
+            self._squared_differences(x1),
+            inv_sq_lengthscale.unsqueeze(-3)
+        ).squeeze(-1)
+        # Same clamping as Kernel.covar_dist, so the gradient is finite on the
+        # diagonal
+        distance = sq_distance.clamp_min(1e-30).sqrt()
+        exp_component = torch.exp(-math.sqrt(self.nu * 2) * distance)
+        if self.nu == 0.5:
+            constant_component = 1
+        elif self.nu == 1.5:
+            constant_component = (math.sqrt(3) * distance).add(1)
+        elif self.nu == 2.5:
+            constant_component = (math.sqrt(5) * distance).add(1).add(
+                5.0 / 3.0 * sq_distance
+            )
+        return constant_component * exp_component
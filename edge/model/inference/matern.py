@@ -4,6 +4,7 @@ import torch
 from edge.utils import atleast_2d, constraint_from_tuple
 from .inference import GP
 from .tensorwrap import tensorwrap, ensure_tensor
+from .kernels.custom_kernels import TrainDistanceCachingMaternKernel
 
 
 class MaternGP(GP):
@@ -87,7 +88,7 @@ class MaternGP(GP):
         ard_num_dims = train_x.shape[1]
 
         covar_module = gpytorch.kernels.ScaleKernel(
-            gpytorch.kernels.MaternKernel(
+            TrainDistanceCachingMaternKernel(
                 nu=nu,
                 ard_num_dims=ard_num_dims,
                 lengthscale_prior=lengthscale_prior,
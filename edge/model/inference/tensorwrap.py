@@ -17,7 +17,10 @@ def ensure_tensor(x, dtype=torch.float, device=None):
     if device is None:
         device = default_device
     if not torch.is_tensor(x):
-        x = torch.tensor(x, device=device).type(dtype)
+        # The tensor is directly created with the right dtype: creating it
+        # first with the dtype of x (typically float64 for numpy arrays) would
+        # allocate and convert a second copy of the data
+        x = torch.tensor(x, dtype=dtype, device=device)
     return x.to(device)
 
 
@@ -3,6 +3,8 @@ import json
 from pathlib import Path
 import logging
 
+from edge.space import Discrete
+
 
 class Model:
     """
@@ -116,6 +118,21 @@ class GPModel(ContinuousModel):
         """
         super(GPModel, self).__init__(env)
         self.gp = gp
+        # On continuous spaces, a stateaction is simply the concatenation of the state and the action
+        self._is_continuous = not (isinstance(env.state_space, Discrete) or
+                                   isinstance(env.action_space, Discrete))
+
+    def _get_stateaction(self, state, action):
+        """
+        Builds the stateaction from a state and an action, as would self.env.stateaction_space[state, action]
+        :param state: np.ndarray: the state
+        :param action: np.ndarray: the action
+        :return: np.ndarray: the stateaction
+        """
+        if self._is_continuous:
+            return np.concatenate((np.atleast_1d(state), np.atleast_1d(action)))
+        else:
+            return self.env.stateaction_space[state, action]
 
     def _query(self, x, return_covar=False, return_covar_matrix=False):
         """
@@ -134,6 +151,18 @@ class GPModel(ContinuousModel):
             output += (prediction.covariance_matrix.detach().cpu().numpy(),)
         return output
 
+    def batch_query(self, index_list):
+        """
+        Queries the mean of the GP on several indexes at once. All the indexes are concatenated and the GP is called
+        only once, which is cheaper than querying each index separately.
+        :param index_list: list of indexes. Each index should be the same format as a StateActionSpace index.
+        :return: list of np.ndarray: the mean value of the GP on each index, in the same order as index_list
+        """
+        queries = [self._get_query_from_index(index) for index in index_list]
+        split_indexes = np.cumsum([len(query) for query in queries])[:-1]
+        mean = self._query(np.vstack(queries))
+        return np.split(mean, split_indexes)
+
     def fit(self, epochs, train_x=None, train_y=None, **optimizer_kwargs):
         """
         Fits the GP's hyperparameters to the data. After training, the GP's dataset is reset to what it was before
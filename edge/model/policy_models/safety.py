@@ -3,12 +3,24 @@ import numpy as np
 from . import Policy
 
 
+def _argmax_index(values, shape):
+    """
+    Returns the index of the maximum of `values`, unraveled into the given shape
+    :param values: np.ndarray: the values. Entries set to -np.inf are never selected unless all entries are -np.inf
+    :param shape: the shape used to unravel the flat index of the maximum
+    :return: tuple: the index
+    """
+    return np.unravel_index(np.argmax(values), shape=shape)
+
+
 class SafetyMaximization(Policy):
     """
     Policy that maximizes safety: it picks the action with highest probability of being safe.
     """
     def __init__(self, stateaction_space):
         super(SafetyMaximization, self).__init__(stateaction_space)
+        self._action_space = stateaction_space.action_space
+        self._action_shape = stateaction_space.action_space.shape
 
     def get_action(self, cautious_probability):
         """
@@ -19,14 +31,16 @@ class SafetyMaximization(Policy):
         """
         # We add some noise so the selected action is not always the same when
         # all actions have similar probability of being cautious
-        cautious_probability += np.random.randn(
-            *cautious_probability.shape
-        ) * 0.001
-        action_index = np.unravel_index(
-            np.argmax(cautious_probability),
-            shape=self.stateaction_space.action_space.shape
+        # The noise is scaled and shifted in place, so the input is not mutated
+        # and only one array is allocated
+        noisy_probability = np.random.standard_normal(cautious_probability.shape)
+        noisy_probability *= 0.001
+        noisy_probability += cautious_probability
+        action_index = _argmax_index(
+            noisy_probability,
+            shape=self._action_shape
         )
-        action = self.stateaction_space.action_space[action_index]
+        action = self._action_space[action_index]
         return action
 
     def get_policy_map(self):
@@ -39,6 +53,8 @@ class SafetyActiveSampling(Policy):
     """
     def __init__(self, stateaction_space):
         super(SafetyActiveSampling, self).__init__(stateaction_space)
+        self._action_space = stateaction_space.action_space
+        self._action_shape = stateaction_space.action_space.shape
 
     def get_action(self, safety_covariance, is_cautious):
         """
@@ -53,15 +69,16 @@ class SafetyActiveSampling(Policy):
 
         # We add some noise so if the covariance is uniform, the sampled
         # action is random
-        safety_covariance = safety_covariance + np.random.randn(
-            *safety_covariance.shape
-        ) * 0.001
-        cautious_indexes = np.argwhere(is_cautious)
-        most_variance_action = np.argmax(
-            safety_covariance[cautious_indexes]
+        noisy_covariance = np.random.standard_normal(safety_covariance.shape)
+        noisy_covariance *= 0.001
+        noisy_covariance += safety_covariance
+        # Non-cautious actions are excluded from the argmax
+        masked_covariance = np.where(is_cautious, noisy_covariance, -np.inf)
+        action_idx = _argmax_index(
+            masked_covariance,
+            shape=self._action_shape
         )
-        action_idx = tuple(cautious_indexes[most_variance_action])
-        action = self.stateaction_space.action_space[action_idx]
+        action = self._action_space[action_idx]
         return action
 
     def get_policy_map(self):
@@ -69,14 +86,27 @@ class SafetyActiveSampling(Policy):
 
 
 class SafeProjectionPolicy(Policy):
+    def __init__(self, stateaction_space):
+        super(SafeProjectionPolicy, self).__init__(stateaction_space)
+        self._actions = None
+
+    @property
+    def actions(self):
+        # The list of all actions is built once, the first time it is needed
+        if self._actions is None:
+            self._actions = np.array([
+                a for _, a in iter(self.stateaction_space.action_space)
+            ], dtype=np.float64)
+        return self._actions
+
     def get_action(self, to_project, constraints):
         if not constraints.any():
             return None
-        actions = np.array([
-            a for _, a in iter(self.stateaction_space.action_space)
-        ], dtype=np.float)
-        distances = np.linalg.norm(actions - to_project, axis=1)
-        distances[~constraints.squeeze()] = np.inf
-        action_idx = np.argmin(distances)
+        actions = self.actions
+        differences = actions - to_project
+        # The argmin of the squared distance is the argmin of the distance
+        sq_distances = np.einsum('ij,ij->i', differences, differences)
+        sq_distances[~constraints.squeeze()] = np.inf
+        action_idx = int(np.argmin(sq_distances))
         action = actions[action_idx]
-        return action
\ No newline at end of file
+        return action
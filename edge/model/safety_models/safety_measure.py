@@ -1,13 +1,32 @@
 import numpy as np
 from scipy.stats import norm
+from numba import njit, prange
 from pathlib import Path
-import warnings, contextlib
+import warnings
 import json
+import math
 
 from .. import GPModel
 from ..inference import MaternGP
 
 
+@njit(parallel=True, fastmath=True, cache=True, error_model='numpy')
+def _safety_cdf(measure, covar, lam):
+    """
+    Computes the probability that each value of the measure is above the lambda threshold. This is equivalent to
+    `norm.cdf((measure - lam) / np.sqrt(np.abs(covar)))`, but is done in a single pass over the arrays.
+    :param measure: np.ndarray: the flattened mean of the measure
+    :param covar: np.ndarray: the flattened covariance of the measure
+    :param lam: the lambda threshold
+    :return: np.ndarray: the probabilities, with the same shape as measure
+    """
+    out = np.empty_like(measure)
+    for i in prange(measure.shape[0]):
+        s = math.sqrt(abs(covar[i]))
+        out[i] = 0.5 * math.erfc(-(measure[i] - lam) / (s * 1.4142135623730951))
+    return out
+
+
 class SafetyMeasure(GPModel):
     """
     Safety measure as described in "A learnable safety measure", by Heim, von Rohr, et al. (2019, CoRL).
@@ -26,6 +45,12 @@ class SafetyMeasure(GPModel):
         """
         super(SafetyMeasure, self).__init__(env, gp)
         self.gamma_measure = gamma_measure
+        # Number of actions per state, used to average the level set over the action space in `measure`
+        self._n_actions = int(np.prod(env.action_space.shape))
+        # List of all actions, used to build the queries of `level_set` on lists of states
+        self._action_grid = env.action_space[:].reshape(
+            (self._n_actions, env.action_space.data_length)
+        )
 
     @property
     def state_dict(self):
@@ -53,7 +78,7 @@ class SafetyMeasure(GPModel):
         else:
             update_value = np.array([0.])
 
-        stateaction = self.env.stateaction_space[state, action]
+        stateaction = self._get_stateaction(state, action)
         self.gp.append_data(stateaction, update_value, forgettable=[not failed],
                             make_forget=[not failed],
                             unskippable=[failed])
@@ -73,11 +98,10 @@ class SafetyMeasure(GPModel):
         level_set = self.level_set(state, lambda_threshold, gamma_threshold,
                                    return_proba=False, return_covar=False)
 
-        level_set = level_set.reshape((-1,) + self.env.action_space.shape)
-        mean_axes = tuple([1 + k
-                           for k in range(self.env.action_space.index_dim)])
+        # Averaging over the flattened action space is a single reduction along the last axis
+        level_set = level_set.reshape((-1, self._n_actions))
 
-        return np.atleast_1d(level_set.mean(mean_axes))
+        return np.atleast_1d(level_set.mean(axis=1))
 
     def is_in_level_set(self, state, action, lambda_threshold, gamma_threshold):
         measure, covar = self.query((state, action), return_covar=True)
@@ -121,6 +145,10 @@ class SafetyMeasure(GPModel):
         else:
             gamma_threshold_list = gamma_threshold
 
+        query_kwargs = {
+            'return_covar': True,
+            'return_covar_matrix': return_covar_matrix
+        }
         if state is None:
             # Unspecfied state means the whole state space
             index = (slice(None, None, None), slice(None, None, None))
@@ -128,18 +156,21 @@ class SafetyMeasure(GPModel):
             index = (state, slice(None, None, None))
         elif state.ndim > 1 and state.shape[0] > 1:
             # This means `state` is a list of states
-            index = [
-                (*s.reshape(-1, 1), slice(None, None, None)) for s in state
-            ]
+            # The stateactions are built directly: each state is repeated once per action, and paired with all the
+            # actions
+            index = None
+            stateactions = np.hstack((
+                np.repeat(state, self._n_actions, axis=0),
+                np.tile(self._action_grid, (state.shape[0], 1))
+            ))
         else:
             index = (*state.reshape(-1, 1), slice(None, None, None))
         output_shape = (-1,) + self.env.action_space.shape
 
-        query_out = self.query(
-            index,
-            return_covar=True,
-            return_covar_matrix=return_covar_matrix,
-        )
+        if index is None:
+            query_out = self._query(stateactions, **query_kwargs)
+        else:
+            query_out = self.query(index, **query_kwargs)
         if return_covar_matrix:
             measure_slice, covar_slice, covar_matrix = query_out
         else:
@@ -153,46 +184,30 @@ class SafetyMeasure(GPModel):
             # lines of the others is simply n_states.
             covar_matrix = covar_matrix.reshape(output_shape)
 
-        # The following prints a user-friendly warning if a runtime warning is encountered in the computation of
-        # level_value_list
         # If the kernel matrix is ill-conditioned, the covariance may be negative
-        # This will raise a RuntimeWarning in np.sqrt(covar_slice)
         # See https://github.com/cornellius-gp/gpytorch/issues/1037
-        with warnings.catch_warnings(record=True) as w:
-            # The contextmanager decorator enables the use of the function in a `with` statement, and
-            # requires that the function is a generator
-            # This function simply returns the list it computes
-            @contextlib.contextmanager
-            def compute_cdf():
-                try:
-                    yield [
-                        norm.cdf(
-                            (measure_slice - lambda_threshold) / np.sqrt(covar_slice)
-                        ) for lambda_threshold in lambda_threshold_list
-                    ]
-                finally:
-                    pass
-
-            with compute_cdf() as cdf_list:  # The list computed by compute_cdf is stored in cdf_list
-                if len(w) > 0:  # We check whether a warning was raised to change its message
-                    original_warning = ''
-                    for wrng in w:
-                        original_warning += str(wrng.message) + '\n'
-                    original_warning = original_warning[:-2]
-                    warning_message = (
-                                'Warning encountered in cumulative density function computation. \nThis may be '
-                                'caused by an ill-conditioned kernel matrix causing a negative covariance.\n'
-                                'Original warning: ' + str(original_warning))
-                    level_value_list = [
-                        norm.cdf(
-                            (measure_slice - lambda_threshold) / np.sqrt(np.abs(covar_slice))
-                        ) for lambda_threshold in lambda_threshold_list
-                    ]
-                else:
-                    warning_message = None
-                    level_value_list = cdf_list  # We store cdf_list so its value is available outside of `with`
-        if warning_message is not None:
-            warnings.warn(warning_message)
+        # In that case, we warn the user and use the absolute value of the covariance instead
+        negative_covar = np.any(covar_slice < 0)
+        if negative_covar:
+            warnings.warn(
+                'Warning in CDF: negative covariance, using |covar|. \nThis may be caused by an ill-conditioned '
+                'kernel matrix.'
+            )
+        if len(lambda_threshold_list) == 1:
+            level_value_list = [_safety_cdf(
+                np.ascontiguousarray(measure_slice, dtype=np.float64).ravel(),
+                np.ascontiguousarray(covar_slice, dtype=np.float64).ravel(),
+                float(lambda_threshold_list[0])
+            ).reshape(measure_slice.shape)]
+        else:
+            covar_for_sqrt = np.abs(covar_slice) if negative_covar else covar_slice
+            # Inverting the standard deviation once and multiplying for each threshold is cheaper than dividing
+            # for each threshold
+            inv_sqrt_c = np.reciprocal(np.sqrt(covar_for_sqrt))
+            level_value_list = [
+                norm.cdf((measure_slice - lambda_threshold) * inv_sqrt_c)
+                for lambda_threshold in lambda_threshold_list
+            ]
 
         level_set_list = [level_value > gamma_threshold
                           for level_value, gamma_threshold in
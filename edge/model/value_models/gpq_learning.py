@@ -38,15 +38,19 @@ class GPQLearning(GPModel):
         :param reward: the reward incurred
         :param failed: whether the agent has failed
         """
-        current_value = self[state, action]
+        # Both queries are done with a single call to the GP
+        current_value, next_values = self.batch_query([
+            (state, action),
+            (new_state, slice(None, None, None))
+        ])
         q_value_step = self.step_size * (
-            reward + self.discount_rate * np.max(self[new_state, :])
+            reward + self.discount_rate * np.max(next_values)
             - current_value
         )
         q_value_update = current_value + q_value_step
 
-        stateaction = self.env.stateaction_space[state, action]
-        self.gp = self.gp.append_data(stateaction, q_value_update)
+        stateaction = self._get_stateaction(state, action)
+        self.gp.append_data(stateaction, q_value_update)
 
     @property
     def state_dict(self):
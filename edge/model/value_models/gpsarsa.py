@@ -16,7 +16,7 @@ class GPSARSA(GPModel):
         super(GPSARSA, self).__init__(env, gp)
 
     def update(self, state, action, new_state, reward, failed, done):
-        stateaction = self.env.stateaction_space[state, action]
+        stateaction = self._get_stateaction(state, action)
         self.gp.append_data(stateaction, np.atleast_1d(reward),
                             is_terminal=np.atleast_1d(done))
 
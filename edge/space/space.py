@@ -113,7 +113,7 @@ class DiscretizableSpace(Space):
         """Samples an index from the space
         :return: tuple
         """
-        ids = tuple(map(np.random.choice, self.index_shape))
+        ids = tuple(np.random.choice(n) for n in self.index_shape)
         if len(ids) == 1:
             return ids[0]
         else:
@@ -227,26 +227,12 @@ class ProductSpace(DiscretizableSpace):
         index = index + tuple([slice(None, None, None)
                                for k in range(n_missing_indexes)])
 
-        def get_dim(ns):
-            """
-            Queries the set corresponding to dimension ns with its corresponding index. In general, the set is
-            1-dimensional (Segment or Discrete), since it is a flattened set. Then, the output is of shape (n,1), where
-            n is the number of values required by the index
-            :param ns: the number of the dimension
-            :return: np.ndarray: the elements corresponding to the index on that dimension
-            """
-            return np.atleast_1d(self._flattened_sets[ns][index[ns]])
-
-        def isnotslice(x):
-            """
-            Checks whether the argument is a slice
-            :param x:
-            :return: False iff x is a slice
-            """
-            return not isinstance(x, slice)
-
-        list_of_items = list(map(get_dim, list(range(self._n_flattened_sets))))
-        item_is_1d = list(map(isnotslice, index))
+        # Each set is queried with its corresponding index. In general, the set is 1-dimensional (Segment or
+        # Discrete), since it is a flattened set. Then, the output is of shape (n,1), where n is the number of values
+        # required by the index
+        list_of_items = [np.atleast_1d(s[i])
+                         for s, i in zip(self._flattened_sets, index)]
+        item_is_1d = [not isinstance(i, slice) for i in index]
 
         # NumPy limits the dimension of arrays to 32, so we need to be careful when meshgridding, and only extend
         # the dimensions along which the user has asked for more than 1 value (i.e., a slice)
@@ -279,6 +265,13 @@ class ProductSpace(DiscretizableSpace):
         # items = np.squeeze(items, axis=dims_to_squeeze)
         return items
 
+    def sample(self):
+        """Samples an element from the space. Each flattened set is sampled directly, instead of sampling an index
+        and indexing the whole space with it
+        :return: np.ndarray
+        """
+        return np.concatenate([s.sample() for s in self._flattened_sets])
+
     def _get_components(self, x, ns):
         """
         Returns the component of element x on dimension ns, where ns indexes over the non-flattened sets.
@@ -292,25 +285,15 @@ class ProductSpace(DiscretizableSpace):
         if len(x) != self.data_length:
             raise ValueError(f"Size mismatch: expected size {self.data_length}"
                              f", got {len(x)}")
-        isin = True
-        for ns in range(self.n_sets):
-            s = self.sets[ns]
-            x_slice = self._get_components(x, ns)
-            isin = isin and (x_slice in s)
-
-        return isin
+        return all(x[index_slice] in s
+                   for index_slice, s in zip(self._index_slices, self.sets))
 
     def is_on_grid(self, x):
         if len(x) != self.data_length:
             raise ValueError(f"Size mismatch: expected size {self.data_length}"
                              f", got {len(x)}")
-        ison = True
-        for ns in range(self.n_sets):
-            s = self.sets[ns]
-            x_slice = self._get_components(x, ns)
-            ison = ison and s.is_on_grid(x_slice)
-
-        return ison
+        return all(s.is_on_grid(x[index_slice])
+                   for index_slice, s in zip(self._index_slices, self.sets))
 
     def get_index_of(self, x, around_ok=False):
         if len(x) != self.data_length:
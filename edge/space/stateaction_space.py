@@ -1,3 +1,5 @@
+import numpy as np
+
 from .space import ProductSpace
 
 
@@ -14,7 +16,13 @@ class StateActionSpace(ProductSpace):
 
     def __getitem__(self, index):
         if len(index) == 2:
-            index = self.get_stateaction(*index)
+            state, action = index
+            if isinstance(state, np.ndarray) and isinstance(action, np.ndarray):
+                # Fast path for the common `space[state, action]` case: the stateaction is the concatenation of the
+                # state and the action, so there is no need to index each set separately
+                index = np.concatenate((state.reshape(-1), action.reshape(-1)))
+            else:
+                index = self.get_stateaction(state, action)
         return super(StateActionSpace, self).__getitem__(index)
 
     @staticmethod
@@ -3,5 +3,5 @@ from .gp_utils import atleast_2d, constraint_from_tuple, dynamically_import, \
     get_hyperparameters
 from .vibly_compatibility_utils import get_parameters_lookup_dictionary
 from .device import cpu, cuda, cuda_available, device
-from .simulation_utils import timeit, append_to_episode, average_performances, \
-    affine_interpolation, log_simulation_parameters
+from .simulation_utils import timeit, EpisodeBuffer, append_to_episode, \
+    average_performances, affine_interpolation, log_simulation_parameters
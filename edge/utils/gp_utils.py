@@ -1,3 +1,4 @@
+import torch
 from gpytorch import constraints
 from numbers import Number
 import numpy as np
@@ -29,17 +30,33 @@ def dynamically_import(name):
 
 
 def get_hyperparameters(gp, constraints=False, around=None):
+    """ Returns the values of the hyperparameters of the GP, after transformation by their constraints
+    All the values are copied to the CPU at once, so there is a single device synchronization.
+    :param gp: the GP
+    :param constraints: whether the entries should be (value, constraint) tuples instead of values
+    :param around: optional: the number of decimals to round the values to
+    :return: dictionary of hyperparameters
+    """
+    names = []
+    transformed = []
+    all_constraints = []
+    with torch.no_grad():
+        for name, param, constraint \
+                in gp.named_parameters_and_constraints():
+            names.append(''.join(name.split('raw_')))
+            all_constraints.append(constraint)
+            transformed.append(constraint.transform(param)
+                               if constraint is not None else param)
+    if len(transformed) == 0:
+        return {}
+    sizes = [t.numel() for t in transformed]
+    values = torch.cat([t.reshape(-1) for t in transformed]).cpu().numpy()
+    if around is not None:
+        values = np.around(values, decimals=around)
+    values = np.split(values, np.cumsum(sizes)[:-1])
     params = {}
-    for name, param, constraint \
-            in gp.named_parameters_and_constraints():
-        if constraint is not None:
-            transformed = constraint.transform(param).cpu().detach().numpy().\
-                          squeeze()
-        else:
-            transformed = param.cpu().detach().numpy().squeeze()
-        if around is not None:
-            transformed = np.around(transformed, around=around)
-        entry = transformed if not constraints else (transformed, constraint)
-        key = ''.join(name.split('raw_'))
-        params[key] = entry
+    for key, t, value, constraint in zip(names, transformed, values,
+                                         all_constraints):
+        value = value.reshape(t.shape).squeeze()
+        params[key] = value if not constraints else (value, constraint)
     return params
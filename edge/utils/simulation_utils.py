@@ -1,5 +1,6 @@
 import functools
 import time
+import numpy as np
 import pandas as pd
 import json
 import logging
@@ -25,26 +26,135 @@ def timeit(f):
     return wrapper
 
 
+class EpisodeBuffer:
+    """ Stores the transitions of an episode with one preallocated array per column.
+    The array of a column is allocated when its first value is written, since its shape and dtype are given by that
+    value. The arrays grow by doubling if the episode exceeds the capacity.
+    """
+    def __init__(self, columns, capacity=None,
+                 float_columns=(Dataset.REWARD,)):
+        """ Initializer
+        :param columns: the names of the columns of the episode
+        :param capacity: the maximal expected length of the episode, typically the steps_done_threshold of the
+            environment. Defaults to 64
+        :param float_columns: the columns where integer values are stored as floats, so a first integer value does not
+            truncate the later ones. Defaults to the rewards
+        """
+        self.capacity = 64 if capacity is None else max(capacity, 1)
+        self.n_steps = 0
+        self._buffers = dict.fromkeys(columns)
+        self.float_columns = set(float_columns)
+
+    def __len__(self):
+        return self.n_steps
+
+    def _allocate(self, cname, value):
+        value = np.asarray(value)
+        dtype = np.float64 if cname in self.float_columns and \
+            value.dtype.kind in 'iu' else value.dtype
+        return np.empty((self.capacity,) + value.shape, dtype=dtype)
+
+    def _grow(self):
+        self.capacity *= 2
+        for cname, buffer in self._buffers.items():
+            if buffer is not None:
+                grown = np.empty((self.capacity,) + buffer.shape[1:],
+                                 dtype=buffer.dtype)
+                grown[:self.n_steps] = buffer[:self.n_steps]
+                self._buffers[cname] = grown
+
+    def append(self, transition):
+        """ Writes a transition at the end of the episode
+        :param transition: dictionary mapping column names to values. The columns that are not specified are left
+            uninitialized for this step
+        """
+        if self.n_steps == self.capacity:
+            self._grow()
+        for cname, value in transition.items():
+            buffer = self._buffers[cname]
+            if buffer is None:
+                buffer = self._allocate(cname, value)
+                self._buffers[cname] = buffer
+            buffer[self.n_steps] = value
+        self.n_steps += 1
+
+    def to_group(self):
+        """ Returns the episode in the format expected by Dataset.add_group. Columns that were never written are filled
+        with None.
+        :return: dictionary mapping column names to arrays of length len(self)
+        """
+        return {cname: buffer[:self.n_steps] if buffer is not None
+                else np.full(self.n_steps, None, dtype=object)
+                for cname, buffer in self._buffers.items()}
+
+
 def append_to_episode(dataset, episode, state, action, new_state, reward,
-                      failed, done):
-    episode[dataset.STATE].append(state)
-    episode[dataset.ACTION].append(action)
-    episode[dataset.NEW].append(new_state)
-    episode[dataset.REWARD].append(reward)
-    episode[dataset.FAILED].append(failed)
-    episode[dataset.DONE].append(done)
+                      failed, done, **other_columns):
+    """ Writes a transition at the end of an episode
+    :param episode: an EpisodeBuffer, or a dictionary mapping column names to lists
+    :param other_columns: the values of the columns that are not in the default columns of the Dataset
+    """
+    transition = {
+        dataset.STATE: state,
+        dataset.ACTION: action,
+        dataset.NEW: new_state,
+        dataset.REWARD: reward,
+        dataset.FAILED: failed,
+        dataset.DONE: done,
+    }
+    transition.update(other_columns)
+    if isinstance(episode, EpisodeBuffer):
+        episode.append(transition)
+    else:
+        for cname, value in transition.items():
+            episode[cname].append(value)
+
+
+def group_codes(df, group_key):
+    """ Computes the index of the group of each row, in the order of the sorted group keys (like the codes of
+    `df.groupby(group_key)`). This uses hashing instead of a groupby, so it does not sort the rows.
+    :param df: the DataFrame
+    :param group_key: a column name, or a list of column names
+    :return: np.ndarray of ints, -1 for rows where a key is missing
+    """
+    keys = [group_key] if isinstance(group_key, str) else list(group_key)
+    codes = []
+    dims = []
+    for key in keys:
+        key_codes, uniques = pd.factorize(df[key], sort=True)
+        codes.append(key_codes)
+        dims.append(max(len(uniques), 1))
+    if len(codes) == 1:
+        return codes[0]
+    # Only the rows with all their keys are factorized, so no code is given
+    # to a combination of keys that only comes from a missing value
+    has_keys = np.all([key_codes >= 0 for key_codes in codes], axis=0)
+    flat = np.full(len(has_keys), -1, dtype=np.intp)
+    if has_keys.any():
+        flat[has_keys], _ = pd.factorize(
+            np.ravel_multi_index([key_codes[has_keys] for key_codes in codes],
+                                 dims),
+            sort=True
+        )
+    return flat
 
 
 def avg_reward_and_failure(df, group_key):
-    r = df.groupby(group_key)[Dataset.REWARD].sum().mean()
-    f = df.groupby(group_key)[Dataset.FAILED].any().mean()
+    codes = group_codes(df, group_key)
+    has_group = codes >= 0
+    codes = codes[has_group]
+    if len(codes) == 0:
+        return np.nan, np.nan
+    rewards = df[Dataset.REWARD].to_numpy(dtype=float)[has_group]
+    failed = df[Dataset.FAILED].to_numpy(dtype=bool)[has_group]
+    r = np.bincount(codes, weights=rewards).mean()
+    f = (np.bincount(codes, weights=failed) > 0).mean()
     return r, f
 
 
 def average_performances(df, group_name, episode_name, last_n_episodes=None):
     group_key = list((group_name, episode_name))
-    ep_global = pd.Series(df.groupby(group_key).grouper.group_info[0],
-                          index=df.index)
+    ep_global = pd.Series(group_codes(df, group_key), index=df.index)
     # ep_global = (ep_change.diff() != 0).fillna(False).cumsum()
     ep_max = ep_global.max()
     if last_n_episodes is None:
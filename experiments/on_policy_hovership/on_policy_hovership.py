@@ -1,16 +1,22 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
 from pathlib import Path
 import logging
 import time
 import numpy as np
+import numba
 import torch
+import gpytorch
 
 from edge.simulation import ModelLearningSimulation
 from edge.graphics.plotter import SafetyPlotter
 from edge.dataset import Dataset
 from edge.utils.logging import config_msg
 from edge.utils import device, cuda, timeit, log_simulation_parameters, \
-    average_performances as general_perfs,\
-    append_to_episode as general_append
+    EpisodeBuffer, \
+    average_performances as general_perfs
+from edge.utils.simulation_utils import \
+    avg_reward_and_failure as general_avg_reward_and_failure
 from edge.model.safety_models import SafetyTruth
 
 # noinspection PyUnresolvedReferences
@@ -23,14 +29,36 @@ GROUP_NAME = 'Training'
 SAFETY_NAME = 'Next safety'
 CTRLR_VIAB = 'Controller is viable'
 FLWD_CTRLR = 'Followed controller'
+# Also logs the full state of the CUDA caching allocator when logging at the
+# DEBUG level. This walks all the allocated blocks, so it is only enabled when
+# debugging
+DEBUG = False
 
+# Seed dataset and hyperparameter priors of the GP of the safety measure
+X_SEED = np.array([[2, .1]])
+Y_SEED = np.array([.5])
+LENGTHSCALE_MEANS = (0.2, 0.2)
+LENGTHSCALE_VARS = (0.1, 0.1)
+LENGTHSCALE_PRIOR = tuple(zip(LENGTHSCALE_MEANS, LENGTHSCALE_VARS))
+OUTPUTSCALE_PRIOR = (1., 10.)
+NOISE_PRIOR = (0.007, 0.1)
 
-def append_to_episode(dataset, episode, state, action, new_state, reward,
-                      failed, done, ctrlr_viab, flwd_ctrlr):
-    general_append(dataset, episode, state, action, new_state, reward,
-                   failed, done)
-    episode[CTRLR_VIAB].append(ctrlr_viab)
-    episode[FLWD_CTRLR].append(flwd_ctrlr)
+
+# The simulation whose agent is tested by the forked worker processes
+_TESTED_SIMULATION = None
+
+
+def _run_test_episode(n_episode, seed):
+    np.random.seed(seed)
+    return _TESTED_SIMULATION.run_test_episode(n_episode)
+
+
+def _is_fork_safe_threading_layer():
+    try:
+        return numba.threading_layer() == 'workqueue'
+    except ValueError:
+        # No parallel kernel has been launched yet
+        return True
 
 
 def average_performances(df, group_name, episode_name, last_n_episodes=None):
@@ -56,9 +84,7 @@ def cautious_qv(agent, safety_truth):
     return cautious_qv_ratio
 
 def avg_reward_and_failure(df):
-    r = df.groupby(Dataset.EPISODE)[Dataset.REWARD].sum().mean()
-    f = df.groupby(Dataset.EPISODE)[Dataset.FAILED].any().mean()
-    return r, f
+    return general_avg_reward_and_failure(df, Dataset.EPISODE)
 
 
 class FixedControllerLowdim(ModelLearningSimulation):
@@ -67,7 +93,13 @@ class FixedControllerLowdim(ModelLearningSimulation):
                  gamma_cautious, lambda_cautious, gamma_optimistic,
                  controller, reset_in_safe_state,
                  n_episodes_train, n_episodes_test, n_train_test,
-                 plot_every=1):
+                 plot_every=1, n_test_workers=1):
+        if n_test_workers > 1:
+            # The parallel kernels of numba run before the test workers are
+            # forked. The TBB and OpenMP threading layers do not survive a
+            # fork (the workers or the parent hang), but the workqueue layer
+            # does. It has to be chosen before the first parallel kernel runs
+            numba.config.THREADING_LAYER = 'workqueue'
         shapedict = {} if shape is None else {'shape': shape}
         self.env = LowGoalHovership(
             goal_state=False,
@@ -75,20 +107,12 @@ class FixedControllerLowdim(ModelLearningSimulation):
             **shapedict  # This matters for the GP
         )
 
-        x_seed = np.array([[2, .1]])
-        y_seed = np.array([.5])
-        lengthscale_means = (0.2, 0.2)
-        lengthscale_vars = (0.1, 0.1)
-        lengthscale_prior = tuple(zip(lengthscale_means, lengthscale_vars))
-        outputscale_prior = (1., 10.)
-        noise_prior = (0.007, 0.1)
-
         gp_params = {
-            'train_x': x_seed,
-            'train_y': y_seed,
-            'outputscale_prior': outputscale_prior,
-            'lengthscale_prior': lengthscale_prior,
-            'noise_prior': noise_prior,
+            'train_x': X_SEED,
+            'train_y': Y_SEED,
+            'outputscale_prior': OUTPUTSCALE_PRIOR,
+            'lengthscale_prior': LENGTHSCALE_PRIOR,
+            'noise_prior': NOISE_PRIOR,
             'mean_constant': None,
             'dataset_type': None,
             'dataset_params': None,
@@ -141,6 +165,7 @@ class FixedControllerLowdim(ModelLearningSimulation):
         self.n_episodes_test = n_episodes_test
         self.n_train_test = n_train_test
         self.plot_every = plot_every
+        self.n_test_workers = n_test_workers
 
         self.training_dataset = Dataset(
             *Dataset.DEFAULT_COLUMNS, CTRLR_VIAB, FLWD_CTRLR,
@@ -150,39 +175,61 @@ class FixedControllerLowdim(ModelLearningSimulation):
                 *Dataset.DEFAULT_COLUMNS, SAFETY_NAME, CTRLR_VIAB, FLWD_CTRLR,
                 group_name=GROUP_NAME, name=f'test'
         )
+        # The datasets are written to disk in the background, so checkpointing
+        # does not block the next training. A single worker keeps the writes
+        # in order
+        self.saving_executor = ThreadPoolExecutor(max_workers=1)
+        self.pending_saves = []
 
     def run_episode(self, n_episode, prefix=None):
-        episode = {cname: []
-                   for cname in self.training_dataset.columns_wo_group}
+        ds = self.training_dataset
+        episode = EpisodeBuffer(ds.columns_wo_group,
+                                capacity=self.env.steps_done_threshold)
+        # The attributes used at every step are bound once, since this loop
+        # runs for every transition
+        agent = self.agent
+        step = agent.step
+        is_viable = self.ground_truth.is_viable
+        append = episode.append
+        on_run_iteration = super().on_run_iteration
+        training_mode = agent.training_mode
+        STATE, ACTION, NEW, REWARD, FAILED, DONE = (
+            ds.STATE, ds.ACTION, ds.NEW, ds.REWARD, ds.FAILED, ds.DONE
+        )
         done = self.env.done
         n = 0
         if prefix is not None:
             self.save_figs(prefix=f'{prefix}_{n}')
         while not done:
-            old_state = self.agent.state
-            new_state, reward, failed, done = self.agent.step()
-            action = self.agent.last_action
-            ctrlr_action = self.agent.last_controller_action
-            ctrlr_viab = self.ground_truth.is_viable(
-                state=old_state, action=ctrlr_action
+            old_state = agent.state
+            new_state, reward, failed, done = step()
+            action = agent.last_action
+            ctrlr_viab = is_viable(
+                state=old_state, action=agent.last_controller_action
             )
-            flwd_ctrlr = self.agent.followed_controller
-            append_to_episode(self.training_dataset, episode, old_state, action,
-                              new_state, reward, failed, done, ctrlr_viab,
-                              flwd_ctrlr)
-            if self.agent.training_mode:
+            flwd_ctrlr = agent.followed_controller
+            append({
+                STATE: old_state,
+                ACTION: action,
+                NEW: new_state,
+                REWARD: reward,
+                FAILED: failed,
+                DONE: done,
+                CTRLR_VIAB: ctrlr_viab,
+                FLWD_CTRLR: flwd_ctrlr,
+            })
+            if training_mode:
                 marker = None
-                color = [1, 0, 0] if self.agent.followed_controller else [0, 1, 0]
-                super().on_run_iteration(state=old_state, action=action,
-                                         new_state=new_state, reward=reward,
-                                         failed=failed, color=color,
-                                         marker=marker)
+                color = [1, 0, 0] if flwd_ctrlr else [0, 1, 0]
+                on_run_iteration(state=old_state, action=action,
+                                 new_state=new_state, reward=reward,
+                                 failed=failed, color=color, marker=marker)
                 if prefix is not None:
                     if (n + 1) % self.plot_every == 0:
                         self.save_figs(prefix=f'{prefix}_{n}')
                 n += 1
-        len_episode = len(episode[self.training_dataset.REWARD])
-        episode[self.training_dataset.EPISODE] = [n_episode] * len_episode
+        episode = episode.to_group()
+        episode[ds.EPISODE] = [n_episode] * len(episode[REWARD])
         return episode
 
     def reset_agent_state(self):
@@ -197,28 +244,71 @@ class FixedControllerLowdim(ModelLearningSimulation):
                 state_index = viable_indexes[np.random.choice(len(viable_indexes))]
                 s = self.env.stateaction_space.state_space[state_index]
                 self.agent.reset(s)
-        while self.env.done:
-            s = self.agent.reset()
-        return s
+        # The environment has a fixed initial state that is not a failure
+        # state, so a single reset is enough
+        if self.env.done:
+            self.agent.reset()
 
+    # All the GP predictions of a training or a testing phase share the same
+    # fast_pred_var context, instead of entering it on each prediction
     @timeit
     def train_agent(self, n_train):
         self.agent.training_mode = True
         # self.save_figs(prefix=f'{n_train}ep{0}')
-        for n in range(self.n_episodes_train):
-            self.reset_agent_state()
-            episode = self.run_episode(n, prefix=f'{n_train}ep{n+1}')
-            self.training_dataset.add_group(episode, group_number=n_train)
-            # if (n+1) % self.plot_every == 0:
-            #     self.save_figs(prefix=f'{n_train}ep{n+1}')
+        with gpytorch.settings.fast_pred_var():
+            for n in range(self.n_episodes_train):
+                self.reset_agent_state()
+                episode = self.run_episode(n, prefix=f'{n_train}ep{n+1}')
+                self.training_dataset.add_group(episode, group_number=n_train)
+                # if (n+1) % self.plot_every == 0:
+                #     self.save_figs(prefix=f'{n_train}ep{n+1}')
 
     @timeit
     def test_agent(self, n_test):
         self.agent.training_mode = False
-        for n in range(self.n_episodes_test):
-            self.reset_agent_state()
-            episode = self.run_episode(n)
-            self.testing_dataset.add_group(episode, group_number=n_test)
+        with gpytorch.settings.fast_pred_var():
+            if self.n_test_workers > 1 and device != cuda:
+                episodes = self.run_test_episodes_in_parallel()
+            else:
+                episodes = (self.run_test_episode(n)
+                            for n in range(self.n_episodes_test))
+            for episode in episodes:
+                self.testing_dataset.add_group(episode, group_number=n_test)
+
+    def run_test_episode(self, n_episode):
+        self.reset_agent_state()
+        return self.run_episode(n_episode)
+
+    def run_test_episodes_in_parallel(self):
+        if not _is_fork_safe_threading_layer():
+            logging.warning(
+                f'The numba threading layer {numba.threading_layer()} is not '
+                'fork-safe: the test episodes are run sequentially'
+            )
+            return [self.run_test_episode(n)
+                    for n in range(self.n_episodes_test)]
+        # The agent is not updated during testing, so the episodes are
+        # independent. The workers are forked and inherit a copy of the
+        # simulation, which avoids pickling the models. CUDA does not support
+        # forking, so this is only used on the CPU. Each episode has its own
+        # seed, so the results do not depend on the number of workers.
+        # Forking while the saving thread holds a lock could deadlock the
+        # workers, so the pending saves are completed first
+        self.wait_for_saves()
+        global _TESTED_SIMULATION
+        _TESTED_SIMULATION = self
+        seeds = np.random.randint(2**31, size=self.n_episodes_test)
+        try:
+            with ProcessPoolExecutor(
+                    max_workers=self.n_test_workers,
+                    mp_context=multiprocessing.get_context('fork'),
+                    initializer=torch.set_num_threads, initargs=(1,)
+            ) as executor:
+                return list(executor.map(
+                    _run_test_episode, range(self.n_episodes_test), seeds
+                ))
+        finally:
+            _TESTED_SIMULATION = None
 
     @timeit
     def log_performance(self, n_train, ds, name_in_log, duration=None,
@@ -250,9 +340,14 @@ class FixedControllerLowdim(ModelLearningSimulation):
         logging.info(message)
 
     def log_memory(self):
-        if device == cuda:
-            message = ('Memory usage\n' + torch.cuda.memory_summary())
-            logging.info(message)
+        if device != cuda:
+            return
+        allocated = torch.cuda.memory_allocated() / 2**20
+        max_allocated = torch.cuda.max_memory_allocated() / 2**20
+        logging.info(f'Memory usage: {allocated:.1f} MiB allocated, '
+                     f'{max_allocated:.1f} MiB at most')
+        if DEBUG and logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug('Memory summary\n' + torch.cuda.memory_summary())
 
     def log_samples(self):
         n_samples = self.agent.safety_model.gp.train_x.shape[0]
@@ -260,10 +355,17 @@ class FixedControllerLowdim(ModelLearningSimulation):
 
     @timeit
     def checkpoint(self, n):
-        self.training_dataset.save(self.data_path)
-        self.testing_dataset.save(self.data_path)
+        for ds in (self.training_dataset, self.testing_dataset):
+            self.pending_saves.append(self.saving_executor.submit(
+                ds.snapshot().save, self.data_path
+            ))
         self.save_safety_model(f'safety_model_{n}')
 
+    def wait_for_saves(self):
+        for future in self.pending_saves:
+            future.result()  # Raises the exception of a failed save, if any
+        self.pending_saves = []
+
     def save_safety_model(self, name):
         savepath = self.local_models_path / 'safety_model' / name
         savepath.mkdir(exist_ok=True, parents=True)
@@ -302,6 +404,8 @@ class FixedControllerLowdim(ModelLearningSimulation):
                                      test_t, header=False, limit_episodes=None)
             chkpt_t = self.checkpoint(n)
             logging.info(f'Checkpointing time: {chkpt_t:.3f} s')
+        self.wait_for_saves()
+        self.saving_executor.shutdown(wait=True)
         self.log_performance(None, self.training_dataset,
                              'Training - Full dataset', duration=None,
                              header=False, limit_episodes=None)
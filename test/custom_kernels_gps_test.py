@@ -1,8 +1,12 @@
 import unittest
 import numpy as np
 import math
+import torch
+from gpytorch.kernels import MaternKernel
 
 from edge.model.inference.symmetric7 import SymmetricMaternCosGP
+from edge.model.inference.kernels.custom_kernels import \
+    TrainDistanceCachingMaternKernel
 
 
 def get_gp(x, y):
@@ -71,6 +75,30 @@ class SymmetricMaternCosGPTest(unittest.TestCase):
         self.assertEqual(mean.shape[0], 1)
         self.assertEqual(tuple(covar.shape), (1, 1))
 
+
+class TrainDistanceCachingMaternKernelTest(unittest.TestCase):
+    def test_matches_matern(self):
+        # In double precision, so the rounding errors of the distance
+        # computation of MaternKernel do not hide a wrong cache
+        x = torch.rand(30, 2, dtype=torch.float64)
+        for ard_num_dims in [None, 2]:
+            for nu in [0.5, 1.5, 2.5]:
+                truth = MaternKernel(nu=nu, ard_num_dims=ard_num_dims).double()
+                truth.lengthscale = torch.rand(1, ard_num_dims or 1,
+                                               dtype=torch.float64) + 0.1
+                cached = TrainDistanceCachingMaternKernel(
+                    nu=nu, ard_num_dims=ard_num_dims
+                ).double()
+                cached.load_state_dict(truth.state_dict())
+                for _ in range(2):  # The second time uses the cache
+                    self.assertTrue(torch.allclose(
+                        truth(x).evaluate(), cached(x).evaluate(), atol=1e-6
+                    ))
+                self.assertTrue(cached._cached_x is x)
+                cached.eval()
+                self.assertIsNone(cached._cached_x)
+
+
 if __name__ == '__main__':
     unittest.main()
 
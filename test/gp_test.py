@@ -12,7 +12,14 @@ from edge.model.inference.tensorwrap import ensure_tensor
 from edge.model.inference import MaternGP, GP
 from edge.model.inference.inference import NeighborErasingDataset
 from edge.model.inference.kernels.value_structure_kernel import ValueStructureKernel
-from edge.utils import constraint_from_tuple
+from edge.utils import constraint_from_tuple, get_hyperparameters
+
+try:
+    import jax
+    import optax
+    HAS_JAX = True
+except ImportError:
+    HAS_JAX = False
 
 
 DEBUG = False
@@ -596,6 +603,57 @@ class TestValueStructureGP(unittest.TestCase):
         self.assertTrue(True)
 
 
+@unittest.skipUnless(HAS_JAX, 'jax and optax are not installed')
+class TestJaxFitting(unittest.TestCase):
+    def test_same_as_torch(self):
+        x = np.linspace(0, 1, 30).reshape((-1, 1))
+        y = np.sin(3 * x).reshape(-1)
+        hyperparameters = {}
+        for backend in ['torch', 'jax']:
+            gp = MaternGP(x, y, noise_prior=(0.1, 0.1),
+                          lengthscale_prior=(0.2, 0.1),
+                          outputscale_prior=(1., 1.), mean_constant=0.1)
+            gp.optimize_hyperparameters(epochs=50, lr=0.05, backend=backend)
+            hyperparameters[backend] = {
+                name: param.detach().cpu().numpy()
+                for name, param in gp.named_parameters()
+            }
+        for name, value in hyperparameters['torch'].items():
+            self.assertTrue(np.allclose(value, hyperparameters['jax'][name],
+                                        atol=1e-3), name)
+
+    def test_unsupported_optimizer_and_mll(self):
+        gp = MaternGP(np.zeros((1, 1)), np.zeros(1))
+        gp.optimizer = torch.optim.SGD
+        with self.assertRaises(NotImplementedError):
+            gp.optimize_hyperparameters(epochs=1, backend='jax')
+        gp.optimizer = torch.optim.Adam
+        gp.mll = gpytorch.mlls.LeaveOneOutPseudoLikelihood
+        with self.assertRaises(NotImplementedError):
+            gp.optimize_hyperparameters(epochs=1, backend='jax')
+
+    def test_unknown_backend(self):
+        gp = MaternGP(np.zeros((1, 1)), np.zeros(1))
+        with self.assertRaises(ValueError):
+            gp.optimize_hyperparameters(epochs=1, backend='unknown')
+
+
+class TestGetHyperparameters(unittest.TestCase):
+    def test_reflects_initialize(self):
+        # GPyTorch's initialize writes through `.data`, which does not bump
+        # the version counter of the parameters: the values must not be
+        # cached based on it
+        gp = MaternGP(np.zeros((1, 1)), np.zeros(1), noise_prior=(0.1, 0.1))
+        noise_key = 'likelihood.noise_covar.noise'
+        self.assertAlmostEqual(float(get_hyperparameters(gp)[noise_key]), 0.1,
+                               places=5)
+        gp.initialize(**{noise_key: 0.5})
+        self.assertAlmostEqual(float(get_hyperparameters(gp)[noise_key]), 0.5,
+                               places=5)
+        rounded = get_hyperparameters(gp, around=1)
+        self.assertEqual(float(rounded[noise_key]), 0.5)
+
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -0,0 +1,49 @@
+import unittest
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).parent.parent.resolve()
+EXPERIMENT_PATH = ROOT_PATH / 'experiments' / 'on_policy_hovership'
+
+# The simulation runs the parallel kernels of the safety measure before
+# forking the test workers. It is run in its own interpreter, since a numba
+# threading layer that does not survive the fork makes it hang at exit
+SCRIPT = """
+import sys
+import matplotlib
+from on_policy_hovership import FixedControllerLowdim
+
+# The figures are not checked, so they do not need LaTeX
+matplotlib.rc('text', usetex=False)
+
+sim = FixedControllerLowdim(
+    name=sys.argv[1], shape=None,
+    gamma_cautious=(0.75, 0.75), lambda_cautious=(0, 0.0),
+    gamma_optimistic=(0.55, 0.70), controller='random',
+    reset_in_safe_state=True, n_episodes_train=1, n_episodes_test=4,
+    n_train_test=1, plot_every=1000, n_test_workers=2
+)
+sim.set_seed(value=0)
+sim.run()
+print(sim.testing_dataset.df[sim.testing_dataset.EPISODE].nunique())
+"""
+
+
+class ParallelTestingTest(unittest.TestCase):
+    def test_parallel_test_episodes(self):
+        with tempfile.TemporaryDirectory() as output_directory:
+            result = subprocess.run(
+                [sys.executable, '-c', SCRIPT, output_directory],
+                cwd=EXPERIMENT_PATH, capture_output=True, text=True,
+                env={**os.environ, 'PYTHONPATH': str(ROOT_PATH)}, timeout=600
+            )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        n_episodes = int(result.stdout.strip().splitlines()[-1])
+        self.assertEqual(n_episodes, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,10 @@
 import unittest
 import numpy as np
 import matplotlib.pyplot as plt
+from scipy.interpolate import RegularGridInterpolator
 
 from edge.graphics.plotter import RewardFailurePlotter
+from edge.graphics.subplotter.q_value_subplotter import _bilinear_2d
 
 
 class PlottersTest(unittest.TestCase):
@@ -45,4 +47,22 @@ class PlottersTest(unittest.TestCase):
                     )
         figure = plotter.get_figure()
         plt.show()
-        self.assertTrue(True)
\ No newline at end of file
+        self.assertTrue(True)
+
+
+class BilinearInterpolationTest(unittest.TestCase):
+    def test_matches_regular_grid_interpolator(self):
+        xs_grid = np.linspace(0, 2, 7)
+        ys_grid = np.linspace(-1, 1, 5)
+        Q = np.random.randn(len(ys_grid), len(xs_grid))
+        truth = RegularGridInterpolator((ys_grid, xs_grid), Q)
+
+        xs = np.random.uniform(-0.5, 2.5, 200)
+        ys = np.random.uniform(-1.5, 1.5, 200)
+        out = np.empty(200)
+        _bilinear_2d(Q, xs_grid[0], xs_grid[1] - xs_grid[0],
+                     ys_grid[0], ys_grid[1] - ys_grid[0], xs, ys, out)
+        # The points outside of the grid are clamped to its boundary
+        clamped = np.stack([np.clip(ys, -1, 1), np.clip(xs, 0, 2)], axis=1)
+        np.testing.assert_allclose(out, truth(clamped), rtol=1e-10,
+                                   atol=1e-12)
@@ -3,6 +3,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 
 from edge.model.policy_models.bayesian import ExpectedImprovementPolicy
+from edge.model.policy_models.safety import SafetyActiveSampling
 from edge.model.inference import MaternGP
 from edge.space import StateActionSpace, Segment
 
@@ -162,3 +163,19 @@ class ExpectedImprovementTest(unittest.TestCase):
             gp.append_data(x=np.atleast_2d(action), y= np.atleast_1d(value))
             best_sample = max(best_sample, value)
         self.assertTrue(True)
+
+
+class SafetyActiveSamplingTest(unittest.TestCase):
+    def test_cautious_argmax(self):
+        _, action_space, sa_space = get_spaces()
+        policy = SafetyActiveSampling(sa_space)
+
+        covariance = np.linspace(0, 1, action_space.shape[0])
+        is_cautious = np.zeros(action_space.shape[0], dtype=bool)
+        is_cautious[100:150] = True
+        action = policy.get_action(covariance, is_cautious)
+        self.assertTrue(np.allclose(action, action_space[149]))
+
+        self.assertIsNone(
+            policy.get_action(covariance, np.zeros_like(is_cautious))
+        )
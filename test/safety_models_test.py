@@ -2,10 +2,12 @@ import unittest
 import numpy as np
 import tempfile
 import gym
+from scipy.stats import norm
 
 from edge.envs import Hovership
 from edge.gym_wrappers import GymEnvironmentWrapper
 from edge.model.safety_models import MaternSafety
+from edge.model.safety_models.safety_measure import _safety_cdf
 
 
 class TestHovership(Hovership):
@@ -193,3 +195,21 @@ class TestSafetyMeasure(unittest.TestCase):
         self.assertTrue((blank.gp.train_x == safety.gp.train_x).all())
         self.assertEqual(blank.gp.structure_dict, safety.gp.structure_dict)
 
+
+class TestSafetyCdf(unittest.TestCase):
+    def test_matches_norm_cdf(self):
+        # Zero and negative covariances are included, since the kernel is
+        # compiled with fastmath
+        measure = np.array([0.5, -0.5, 0.3, 0.1, 0.2, 0.2, 1., -2.])
+        covar = np.array([0.1, 0.1, 0., 0., 0., -0.04, -1e-3, 2.])
+        lam = 0.2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            truth = norm.cdf((measure - lam) / np.sqrt(np.abs(covar)))
+        np.testing.assert_allclose(_safety_cdf(measure, covar, lam), truth,
+                                   rtol=1e-12, atol=1e-12)
+
+        measure = np.random.randn(1000)
+        covar = np.random.randn(1000)
+        truth = norm.cdf((measure - lam) / np.sqrt(np.abs(covar)))
+        np.testing.assert_allclose(_safety_cdf(measure, covar, lam), truth,
+                                   rtol=1e-10, atol=1e-12)
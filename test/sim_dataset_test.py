@@ -1,9 +1,11 @@
 import unittest
 import numpy as np
+import pandas as pd
 from pathlib import Path
 
 from edge.dataset import Dataset
-from edge.utils import average_performances
+from edge.utils import average_performances, EpisodeBuffer, append_to_episode
+from edge.utils.simulation_utils import group_codes, avg_reward_and_failure
 
 
 class DatasetTest(unittest.TestCase):
@@ -98,4 +100,99 @@ class DatasetTest(unittest.TestCase):
         perfs = average_performances(df, ds.group_name, ds.EPISODE,
                                      last_n_episodes=3)
         truth = (9, 1/3)
-        self.assertTupleEqual(perfs, truth)
\ No newline at end of file
+        self.assertTupleEqual(perfs, truth)
+
+    def test_avg_reward_and_failure_missing_keys(self):
+        df = pd.DataFrame({
+            'Training': [0, 0, 1, 1, 1],
+            Dataset.EPISODE: [0, 1, 1, np.nan, 1],
+            Dataset.REWARD: [1., 2., 3., 4., 5.],
+            Dataset.FAILED: [False, True, False, False, False],
+        })
+        group_key = ['Training', Dataset.EPISODE]
+        grouped = df.groupby(group_key)
+        truth = (grouped[Dataset.REWARD].sum().mean(),
+                 grouped[Dataset.FAILED].any().mean())
+        self.assertEqual(list(group_codes(df, group_key)), [0, 1, 2, -1, 2])
+        perfs = avg_reward_and_failure(df, group_key)
+        self.assertAlmostEqual(perfs[0], truth[0])
+        self.assertAlmostEqual(perfs[1], truth[1])
+
+    def test_episode_buffer(self):
+        ds = Dataset(*Dataset.DEFAULT_COLUMNS, 'extra')
+        episode = EpisodeBuffer(ds.columns_wo_group, capacity=2)
+        s, a, s_ = np.array([0., 1., 2.])[:, np.newaxis]
+        for t in range(3):
+            append_to_episode(ds, episode, s, a, s_, t, False, t == 2,
+                              extra=t % 2 == 0)
+        self.assertEqual(len(episode), 3)
+        group = episode.to_group()
+        self.assertNotIn(ds.EPISODE, group)
+        self.assertEqual(group[ds.STATE].shape, (3, 1))
+        self.assertEqual(group[ds.REWARD].dtype, np.float64)
+        self.assertListEqual(list(group['extra']), [True, False, True])
+
+        ds.add_group(group, group_number=4)
+        self.assertEqual(len(ds.df), 3)
+        self.assertListEqual(list(ds.df[ds.EPISODE]), [4, 4, 4])
+        self.assertListEqual(list(ds.df[ds.REWARD]), [0., 1., 2.])
+        self.assertTrue((ds.df[ds.STATE].iloc[1] == s).all())
+
+        episode = EpisodeBuffer(ds.columns_wo_group)
+        append_to_episode(ds, episode, 1, 0, 2, 1, False, False, extra=1)
+        group = episode.to_group()
+        self.assertEqual(group[ds.STATE].dtype.kind, 'i')
+        self.assertEqual(group['extra'].dtype.kind, 'i')
+        self.assertEqual(group[ds.REWARD].dtype, np.float64)
+
+        episode = {cname: [] for cname in ds.columns_wo_group}
+        append_to_episode(ds, episode, s, a, s_, 1., False, True, extra=True)
+        self.assertListEqual(episode[ds.REWARD], [1.])
+        self.assertListEqual(episode['extra'], [True])
+
+        empty = EpisodeBuffer(ds.columns_wo_group).to_group()
+        self.assertListEqual(list(empty.keys()), ds.columns_wo_group)
+        self.assertEqual(len(empty[ds.REWARD]), 0)
+        ds.add_group(empty, group_number=5)
+        self.assertEqual(len(ds.df), 3)
+
+    def test_dtypes(self):
+        # The dtypes of a new Dataset are inferred from the added rows
+        ds = Dataset(*Dataset.DEFAULT_COLUMNS)
+        ds.add_group({ds.REWARD: [1., 2.5], ds.FAILED: [False, True],
+                      ds.DONE: [False, True]}, group_number=0)
+        ds.add_group({ds.REWARD: [3.], ds.FAILED: [False],
+                      ds.DONE: [True]}, group_number=1)
+        self.assertListEqual(list(ds.df.columns), ds.columns)
+        self.assertEqual(ds.df[ds.EPISODE].dtype, np.int64)
+        self.assertEqual(ds.df[ds.REWARD].dtype, np.float64)
+        self.assertEqual(ds.df[ds.FAILED].dtype, bool)
+        self.assertEqual(ds.df[ds.DONE].dtype, bool)
+        self.assertEqual(ds.df[ds.STATE].dtype, object)
+
+        ds = Dataset('a', 'b', group_name='group')
+        ds.add_entry(0, 1, True)
+        ds.add_entry(0, 2.5, False)
+        self.assertEqual(ds.df['a'].dtype, np.float64)
+
+        ds.df = pd.DataFrame({'group': [0], 'a': [1], 'b': [True]})
+        ds.add_entry(1, 2.5)
+        self.assertEqual(ds.df['group'].dtype, np.int64)
+        self.assertEqual(ds.df['a'].dtype, np.float64)
+        self.assertEqual(ds.df['b'].dtype, object)
+
+    def test_add_group_ragged_column(self):
+        ds = Dataset('a', 'b', group_name='group')
+        ds.add_group({'a': [[1.], [2., 3.]], 'b': [True, False]},
+                     group_number=0)
+        self.assertListEqual(list(ds.df['a']), [[1.], [2., 3.]])
+
+    def test_snapshot(self):
+        ds = Dataset('a', 'b', group_name='group', name='my_dataset')
+        ds.add_group({'a': [1., 2.], 'b': [True, False]}, group_number=0)
+        snapshot = ds.snapshot()
+        ds.add_group({'a': [3.], 'b': [True]}, group_number=1)
+        self._test_columns_equal(snapshot, ds.columns, ds.columns_wo_group)
+        self.assertEqual(snapshot.name, ds.name)
+        self.assertEqual(len(snapshot.df), 2)
+        self.assertEqual(len(ds.df), 3)